@@ -0,0 +1,151 @@
+"""Compressed, content addressed archive of the raw SWAPI items.
+
+Layout of the archive folder:
+
+    objects.pack        zlib compressed chunks of item payloads, appended one after the other
+    index.json          {sha256 of the payload: [chunk offset, chunk length, start, end]},
+                        start and end being the position of the payload in the chunk
+    snapshots/<name>.json
+                        {category: [[id, sha256], ...]} for every stored run
+
+The new payloads of a category are compressed together in chunks of up to
+CHUNK_SIZE bytes, so the items share the compression context, and a single
+item is read with one seek and the decompression of its chunk only. An item
+that did not change between snapshots has the same hash and is stored only
+once.
+"""
+
+import hashlib
+import json
+import os
+import zlib
+
+from swapi_entities import url_to_id
+
+
+# uncompressed size of a chunk of payloads
+CHUNK_SIZE = 64 * 1024
+
+
+class RawArchive:
+
+    def __init__(self, path):
+        self.path = path
+        self.pack_path = os.path.join(path, 'objects.pack')
+        self.index_path = os.path.join(path, 'index.json')
+        self.snapshots_path = os.path.join(path, 'snapshots')
+        os.makedirs(self.snapshots_path, exist_ok=True)
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as file:
+                self.index = json.load(file)
+        else:
+            self.index = {}
+        # {snapshot name: manifest}, filled when a snapshot is first read
+        self._manifests = {}
+        # {snapshot name: {category: {id: sha256}}} for the random access by id
+        self._lookups = {}
+
+    # ## Writing
+
+    def write_snapshot(self, name, raw_dict):
+        """Store all the items of raw_dict as snapshot `name`.
+
+        Returns the number of items of the snapshot and the number of new
+        payloads actually appended to the pack.
+        """
+        manifest = {}
+        new_payloads = 0
+
+        with open(self.pack_path, 'ab') as pack:
+            for cat, items in raw_dict.items():
+                entries = []
+                # new payloads of the category waiting to be compressed: {sha256: payload}
+                chunk, chunk_size = {}, 0
+                for item in items:
+                    payload = json.dumps(item, separators=(',', ':')).encode('utf-8')
+                    digest = hashlib.sha256(payload).hexdigest()
+
+                    if digest not in self.index and digest not in chunk:
+                        chunk[digest] = payload
+                        chunk_size += len(payload)
+                        new_payloads += 1
+                        if chunk_size >= CHUNK_SIZE:
+                            self._write_chunk(pack, chunk)
+                            chunk, chunk_size = {}, 0
+
+                    entries.append([url_to_id(item['url']), digest])
+                self._write_chunk(pack, chunk)
+                manifest[cat] = entries
+
+        self._save_json(self.index, self.index_path)
+        self._save_json(manifest, self._manifest_path(name))
+        self._manifests[name] = manifest
+        self._lookups.pop(name, None)
+
+        return sum(len(v) for v in manifest.values()), new_payloads
+
+    def _write_chunk(self, pack, chunk):
+        if not chunk:
+            return
+        data = zlib.compress(b''.join(chunk.values()), 9)
+        offset = pack.tell()
+        start = 0
+        for digest, payload in chunk.items():
+            self.index[digest] = [offset, len(data), start, start + len(payload)]
+            start += len(payload)
+        pack.write(data)
+
+    def _save_json(self, content, path):
+        # write to a temporary file first so a crash never leaves a truncated file
+        with open(path + '.tmp', 'w') as file:
+            json.dump(content, file, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+
+    # ## Reading
+
+    def _manifest_path(self, name):
+        return os.path.join(self.snapshots_path, f'{name}.json')
+
+    def snapshots(self):
+        """Names of the stored snapshots, oldest first when named by date."""
+        return sorted(f[:-len('.json')] for f in os.listdir(self.snapshots_path)
+                      if f.endswith('.json'))
+
+    def manifest(self, name):
+        if name not in self._manifests:
+            with open(self._manifest_path(name), 'r') as file:
+                self._manifests[name] = json.load(file)
+        return self._manifests[name]
+
+    def _read_payloads(self, digests):
+        items = []
+        # the items of a category are usually in the same few chunks
+        chunks = {}
+        with open(self.pack_path, 'rb') as pack:
+            for digest in digests:
+                offset, length, start, end = self.index[digest]
+                if offset not in chunks:
+                    pack.seek(offset)
+                    chunks[offset] = zlib.decompress(pack.read(length))
+                items.append(json.loads(chunks[offset][start:end]))
+        return items
+
+    def read_item(self, name, category, item_id):
+        """Raw item `item_id` of `category` in snapshot `name`."""
+        if name not in self._lookups:
+            self._lookups[name] = {cat: dict(map(tuple, entries))
+                                   for cat, entries in self.manifest(name).items()}
+        try:
+            digest = self._lookups[name][category][item_id]
+        except KeyError:
+            raise KeyError(f'{category} item {item_id} not found in snapshot {name}')
+        return self._read_payloads([digest])[0]
+
+    def read_category(self, name, category):
+        """All raw items of `category` in snapshot `name`, in scraping order."""
+        return self._read_payloads(digest for _, digest in self.manifest(name)[category])
+
+    def read_snapshot(self, name):
+        """The whole snapshot with the layout of starwars_raw.json."""
+        return {cat: self.read_category(name, cat) for cat in self.manifest(name)}
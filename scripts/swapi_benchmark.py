@@ -0,0 +1,281 @@
+"""Benchmark of the queries we run against the schema of create_sw_db.sql.
+
+A synthetic dataset, `scale` times the size of the SWAPI with the same
+average number of links per item, is loaded into every configured database:
+
+* SQLite (in memory), always,
+* DuckDB (in memory) when duckdb-engine is installed,
+* the database of the BENCH_DB_URL environment variable (e.g. a MySQL
+  database). It must be a scratch database: the benchmark refuses to run
+  when a table of the schema already exists, and only drops the tables it
+  created.
+
+A fixed set of join queries across the junction tables is run `repeat`
+times with random ids, first with the schema as is and then with indexes
+on the foreign key columns, and the p50/p99 latencies are reported. The
+foreign key columns already indexed by the database (InnoDB indexes every
+foreign key) are detected and not indexed twice.
+
+Usage (from the scripts folder):
+
+    python swapi_benchmark.py --scale 100 --repeat 200
+"""
+
+import argparse
+import importlib.util
+import os
+import re
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, inspect, text
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'create_sw_db.sql')
+
+# items per category in the SWAPI
+BASE_COUNTS = {'planets': 60, 'species': 37, 'vehicles': 39, 'starships': 36, 'films': 6, 'people': 82}
+
+# junction table -> (left column, left category, right column, right category, links per left item)
+JUNCTIONS = {
+    'films_people': ('film_id', 'films', 'character_id', 'people', 30),
+    'films_planets': ('film_id', 'films', 'planet_id', 'planets', 5),
+    'films_starships': ('film_id', 'films', 'starship_id', 'starships', 6),
+    'films_vehicles': ('film_id', 'films', 'vehicle_id', 'vehicles', 7),
+    'films_species': ('film_id', 'films', 'species_id', 'species', 6),
+    'people_starships': ('character_id', 'people', 'starship_id', 'starships', 0.2),
+    'people_vehicles': ('character_id', 'people', 'vehicle_id', 'vehicles', 0.1),
+}
+
+ID_COLUMNS = {'planets': 'planet_id', 'species': 'species_id', 'vehicles': 'vehicle_id',
+              'starships': 'starship_id', 'films': 'film_id', 'people': 'character_id'}
+
+# name -> (sql, category of the :id parameter)
+QUERIES = {
+    'characters_of_film': (
+        '''SELECT p.name FROM films_people fp
+           JOIN people p ON p.character_id = fp.character_id
+           WHERE fp.film_id = :id''', 'films'),
+    'films_of_character': (
+        '''SELECT f.title FROM films_people fp
+           JOIN films f ON f.film_id = fp.film_id
+           WHERE fp.character_id = :id''', 'people'),
+    'pilots_of_starship': (
+        '''SELECT p.name FROM people_starships ps
+           JOIN people p ON p.character_id = ps.character_id
+           WHERE ps.starship_id = :id''', 'starships'),
+    'films_of_planet': (
+        '''SELECT f.title FROM films_planets fp
+           JOIN films f ON f.film_id = fp.film_id
+           WHERE fp.planet_id = :id''', 'planets'),
+    'species_of_film_with_homeworld': (
+        '''SELECT s.name, pl.name FROM films_species fs
+           JOIN species s ON s.species_id = fs.species_id
+           LEFT JOIN planets pl ON pl.planet_id = s.homeworld_id
+           WHERE fs.film_id = :id''', 'films'),
+    'residents_of_planet': (
+        '''SELECT p.name FROM people p
+           WHERE p.homeworld_id = :id''', 'planets'),
+    'co_stars_of_character': (
+        '''SELECT DISTINCT fp2.character_id FROM films_people fp1
+           JOIN films_people fp2 ON fp2.film_id = fp1.film_id
+           WHERE fp1.character_id = :id''', 'people'),
+    'vehicles_per_film': (
+        '''SELECT f.film_id, COUNT(fv.vehicle_id) FROM films f
+           LEFT JOIN films_vehicles fv ON fv.film_id = f.film_id
+           GROUP BY f.film_id''', None),
+}
+
+# indexes on the foreign key columns not covered by a primary key
+INDEXES = {
+    'idx_films_people_character': ('films_people', 'character_id'),
+    'idx_films_planets_planet': ('films_planets', 'planet_id'),
+    'idx_films_starships_starship': ('films_starships', 'starship_id'),
+    'idx_films_vehicles_vehicle': ('films_vehicles', 'vehicle_id'),
+    'idx_films_species_species': ('films_species', 'species_id'),
+    'idx_people_starships_starship': ('people_starships', 'starship_id'),
+    'idx_people_vehicles_vehicle': ('people_vehicles', 'vehicle_id'),
+    'idx_people_homeworld': ('people', 'homeworld_id'),
+    'idx_people_species': ('people', 'species_id'),
+    'idx_species_homeworld': ('species', 'homeworld_id'),
+}
+
+
+def backend_urls():
+    """SQLAlchemy urls of the databases to benchmark."""
+    urls = {'sqlite': 'sqlite://'}
+    if importlib.util.find_spec('duckdb_engine') is not None:
+        urls['duckdb'] = 'duckdb:///:memory:'
+    if os.getenv('BENCH_DB_URL'):
+        urls[os.getenv('BENCH_DB_URL').split(':')[0]] = os.getenv('BENCH_DB_URL')
+    return urls
+
+
+def schema_statements(path=SCHEMA_PATH):
+    """CREATE TABLE statements of the schema file (without CREATE DATABASE / USE)."""
+    with open(path, 'r') as file:
+        sql = re.sub(r'--.*', '', file.read())
+    statements = [s.strip() for s in sql.split(';') if s.strip()]
+    return [s for s in statements if s.upper().startswith('CREATE TABLE')]
+
+
+# # Synthetic dataset
+
+def synthetic_dataset(scale=1, seed=0):
+    """Category tables and junction tables `scale` times the size of the SWAPI."""
+    rng = np.random.default_rng(seed)
+    counts = {cat: max(1, int(round(n * scale))) for cat, n in BASE_COUNTS.items()}
+
+    tables = {}
+    for cat, n in counts.items():
+        ids = np.arange(1, n + 1)
+        name_col = 'title' if cat == 'films' else 'name'
+        tables[cat] = pd.DataFrame({ID_COLUMNS[cat]: ids, name_col: [f'{cat} {i}' for i in ids]})
+
+    tables['species']['homeworld_id'] = rng.integers(1, counts['planets'] + 1, counts['species'])
+    tables['people']['homeworld_id'] = rng.integers(1, counts['planets'] + 1, counts['people'])
+    tables['people']['species_id'] = rng.integers(1, counts['species'] + 1, counts['people'])
+
+    for table, (left_col, left_cat, right_col, right_cat, per_item) in JUNCTIONS.items():
+        n_edges = int(round(counts[left_cat] * per_item))
+        edges = pd.DataFrame({
+            left_col: rng.integers(1, counts[left_cat] + 1, n_edges),
+            right_col: rng.integers(1, counts[right_cat] + 1, n_edges),
+        })
+        # the pair is the primary key of the junction tables
+        tables[table] = edges.drop_duplicates().sort_values([left_col, right_col], ignore_index=True)
+
+    return tables, counts
+
+
+# # Benchmark
+
+def _table_name(statement):
+    """Name of the table of a CREATE TABLE statement, None for other statements."""
+    match = re.match(r'CREATE TABLE\s+(?:IF NOT EXISTS\s+)?(\w+)', statement, re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def load(engine, tables, created):
+    """Create the schema and insert the tables (parents before children).
+
+    Refuses to run when a table of the schema already exists, so the
+    benchmark never writes to (or drops) real tables. The names of the
+    tables created are appended to `created` as they are created.
+    """
+    statements = schema_statements()
+    schema_tables = {_table_name(s) for s in statements} - {None}
+    existing = set(inspect(engine).get_table_names()) & schema_tables
+    if existing:
+        raise RuntimeError(f'Tables {sorted(existing)} already exist, use a scratch database for the benchmark')
+
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+            if _table_name(statement):
+                created.append(_table_name(statement))
+    for table, df in tables.items():
+        df.to_sql(name=table, con=engine, if_exists='append', index=False, chunksize=1000)
+
+
+def drop(engine, created):
+    """Drop the tables created by the benchmark (children before parents)."""
+    with engine.begin() as conn:
+        for table in reversed(created):
+            conn.execute(text(f'DROP TABLE IF EXISTS {table}'))
+
+
+def run_queries(engine, counts, repeat, seed=0):
+    """Latencies in milliseconds of every query: {name: [ms, ...]}."""
+    rng = np.random.default_rng(seed)
+    latencies = {}
+    with engine.connect() as conn:
+        for name, (sql, id_cat) in QUERIES.items():
+            query = text(sql)
+            timings = []
+            for _ in range(repeat):
+                params = {'id': int(rng.integers(1, counts[id_cat] + 1))} if id_cat else {}
+                start = perf_counter()
+                conn.execute(query, params).fetchall()
+                timings.append((perf_counter() - start) * 1000)
+            latencies[name] = timings
+    return latencies
+
+
+def indexed_columns(engine):
+    """(table, column) pairs of INDEXES already covered by an index of the database.
+
+    InnoDB (MySQL) creates an index for every foreign key, so there the
+    schema as is already has most of them.
+    """
+    inspector = inspect(engine)
+    covered = set()
+    for table in {table for table, _ in INDEXES.values()}:
+        for index in inspector.get_indexes(table):
+            if index['column_names']:
+                covered.add((table, index['column_names'][0]))
+    return {pair for pair in INDEXES.values() if pair in covered}
+
+
+def add_indexes(engine):
+    """Create the INDEXES not already covered; returns the names of the created ones."""
+    covered = indexed_columns(engine)
+    added = []
+    with engine.begin() as conn:
+        for index, (table, column) in INDEXES.items():
+            if (table, column) not in covered:
+                conn.execute(text(f'CREATE INDEX {index} ON {table} ({column})'))
+                added.append(index)
+    return added
+
+
+def benchmark(scale=1, repeat=100, seed=0, urls=None):
+    """Run the benchmark on every backend and return the latency report.
+
+    `existing_indexes` is the number of INDEXES the schema already had on
+    the backend and `added_indexes` the number created for the run.
+    """
+    tables, counts = synthetic_dataset(scale, seed)
+    rows = []
+
+    for backend, url in (urls or backend_urls()).items():
+        engine = create_engine(url)
+        created = []
+        try:
+            load(engine, tables, created)
+            existing = len(indexed_columns(engine))
+            added = []
+            for indexes in (False, True):
+                if indexes:
+                    added = add_indexes(engine)
+                for query, timings in run_queries(engine, counts, repeat, seed).items():
+                    rows.append({
+                        'backend': backend,
+                        'indexes': indexes,
+                        'query': query,
+                        'p50_ms': np.percentile(timings, 50),
+                        'p99_ms': np.percentile(timings, 99),
+                        'existing_indexes': existing,
+                        'added_indexes': len(added),
+                    })
+        finally:
+            drop(engine, created)
+            engine.dispose()
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query benchmark of the Star Wars schema.')
+    parser.add_argument('--scale', type=float, default=10, help='size of the dataset, in SWAPI sizes')
+    parser.add_argument('--repeat', type=int, default=100, help='runs of every query')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    report = benchmark(args.scale, args.repeat, args.seed)
+    for backend, group in report.groupby('backend'):
+        print(f"{backend}: {group['existing_indexes'].iloc[0]} of the {len(INDEXES)} foreign key indexes "
+              f"already in the schema, {group['added_indexes'].max()} added")
+    print(report.pivot_table(index=['backend', 'query'], columns='indexes',
+                             values=['p50_ms', 'p99_ms']).round(3).to_string())
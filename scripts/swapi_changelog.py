@@ -0,0 +1,122 @@
+"""Change data capture between two runs of the pipeline.
+
+A snapshot keeps, for every category table, one hash per row keyed on the
+table id column and, for every junction table, the set of edges. Comparing
+the dataframes of the current run with the snapshot of the previous run
+gives the inserts, updates and deletes, written as a NDJSON changelog with
+one change per line:
+
+    {"op": "update", "table": "people", "key": {"character_id": 1}, "row": {...}}
+    {"op": "delete", "table": "films_people", "key": {"film_id": 1, "character_id": 2}}
+"""
+
+import json
+import os
+
+import pandas as pd
+
+
+def row_hashes(df, key):
+    """Return {id: hash} for every row of a category dataframe."""
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    return {int(k): format(h, '016x') for k, h in zip(df[key], hashes)}
+
+
+def edge_set(df):
+    """Return the set of (left_id, right_id) edges of a junction table."""
+    edges = df.dropna().astype('int64')
+    return set(map(tuple, edges.to_numpy().tolist()))
+
+
+def take_snapshot(dataframes, junction_tables):
+    """Snapshot of the row hashes and junction edges of the current run.
+
+    The key of each category table is its first column (the table id).
+    """
+    return {
+        'tables': {
+            name: {'key': df.columns[0], 'rows': row_hashes(df, df.columns[0])}
+            for name, df in dataframes.items()
+        },
+        'edges': {
+            name: {'columns': list(df.columns), 'edges': sorted(edge_set(df))}
+            for name, df in junction_tables.items()
+        },
+    }
+
+
+def _records(df):
+    # to_json takes care of NaN -> null and dates -> iso strings
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def diff_table(name, df, previous):
+    """Changes of a category table against its previous snapshot entry."""
+    key = df.columns[0]
+    old_rows = previous['rows'] if previous else {}
+    new_rows = row_hashes(df, key)
+
+    changed = [k for k, h in new_rows.items() if old_rows.get(k) != h]
+    changes = []
+    for row in _records(df[df[key].isin(changed)]):
+        op = 'update' if row[key] in old_rows else 'insert'
+        changes.append({'op': op, 'table': name, 'key': {key: row[key]}, 'row': row})
+
+    for k in sorted(set(old_rows) - set(new_rows)):
+        changes.append({'op': 'delete', 'table': name, 'key': {key: k}})
+    return changes
+
+
+def diff_edges(name, df, previous):
+    """Inserted and deleted edges of a junction table."""
+    columns = list(df.columns)
+    old_edges = set(map(tuple, previous['edges'])) if previous else set()
+    new_edges = edge_set(df)
+
+    changes = []
+    for op, edges in (('insert', new_edges - old_edges), ('delete', old_edges - new_edges)):
+        for edge in sorted(edges):
+            change = {'op': op, 'table': name, 'key': dict(zip(columns, edge))}
+            if op == 'insert':
+                change['row'] = change['key']
+            changes.append(change)
+    return changes
+
+
+def build_changelog(dataframes, junction_tables, previous):
+    """List of changes of the current run against the previous snapshot.
+
+    With no previous snapshot (first run) every row is an insert.
+    """
+    previous = previous or {'tables': {}, 'edges': {}}
+    changes = []
+    for name, df in dataframes.items():
+        changes += diff_table(name, df, previous['tables'].get(name))
+    for name, df in junction_tables.items():
+        changes += diff_edges(name, df, previous['edges'].get(name))
+    return changes
+
+
+def load_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        snapshot = json.load(file)
+    # json turns the integer ids into strings
+    for table in snapshot['tables'].values():
+        table['rows'] = {int(k): h for k, h in table['rows'].items()}
+    return snapshot
+
+
+def save_snapshot(snapshot, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(snapshot, file)
+
+
+def write_changelog(changes, path):
+    """Write the changes as NDJSON, one change per line."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as file:
+        for change in changes:
+            file.write(json.dumps(change) + '\n')
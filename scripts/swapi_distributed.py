@@ -0,0 +1,284 @@
+"""Distributed extraction of the SWAPI with a shared work queue.
+
+The coordinator reads the first page of every category to get the `count`
+of items, splits the category into one work unit per page and puts the
+units in a queue stored in a SQLite file. Any number of worker processes
+claim units, download the page and write the items back to the queue
+database. Once every unit is done the coordinator merges the pages into the
+layout of starwars_raw.json.
+
+The queue uses SQLite in WAL mode, which needs the workers on the machine
+holding the file: it cannot be shared over a network filesystem.
+
+Claimed units are leased: a unit whose worker died is claimed again once
+its lease expires, up to `max_attempts` times. The lease must be longer
+than the download of a page (the requests timeout is 30 seconds).
+A unit whose download failed is only claimed again after a backoff
+(`retry_seconds`, doubled at every attempt), so a short outage or rate
+limit of the SWAPI does not use all the attempts at once.
+
+Usage (from the scripts folder):
+
+    python swapi_distributed.py coordinator ../data/work_queue.sqlite --workers 4
+    python swapi_distributed.py worker ../data/work_queue.sqlite
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import requests as rq
+
+
+SWAPI_URL = 'https://swapi.dev/api/'
+base_urls = {cat: f'{SWAPI_URL}{cat}/'
+             for cat in ['films', 'people', 'planets', 'species', 'starships', 'vehicles']}
+
+
+def fetch_json(url):
+    response = rq.get(url, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+# # Work queue
+
+class WorkQueue:
+
+    def __init__(self, path, lease_seconds=60, max_attempts=3, retry_seconds=5):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        # autocommit mode, the transactions are opened explicitly
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS units (
+                unit_id INTEGER PRIMARY KEY,
+                category TEXT,
+                page INTEGER,
+                url TEXT,
+                status TEXT DEFAULT 'pending',
+                worker TEXT,
+                -- end of the lease, or time of the next retry of a pending unit
+                lease_expires REAL,
+                attempts INTEGER DEFAULT 0,
+                UNIQUE (category, page)
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                unit_id INTEGER PRIMARY KEY,
+                items TEXT
+            );
+        ''')
+
+    def close(self):
+        self.db.close()
+
+    def clear(self):
+        """Remove the units and results of a previous run."""
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            self.db.execute('DELETE FROM results')
+            self.db.execute('DELETE FROM units')
+            self.db.execute('COMMIT')
+        except Exception:
+            self.db.execute('ROLLBACK')
+            raise
+
+    def enqueue(self, category, base_url, pages):
+        """Add one unit per page of the category (pages already queued are kept)."""
+        self.db.executemany(
+            'INSERT OR IGNORE INTO units (category, page, url) VALUES (?, ?, ?)',
+            [(category, page, f'{base_url}?page={page}') for page in pages])
+
+    def claim(self, worker):
+        """Lease the next pending or expired unit to `worker`, None if there is none."""
+        now = time.time()
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            while True:
+                unit = self.db.execute(
+                    '''SELECT unit_id, category, page, url, attempts FROM units
+                       WHERE (status = 'pending' AND COALESCE(lease_expires, 0) <= ?)
+                          OR (status = 'leased' AND lease_expires < ?)
+                       ORDER BY unit_id LIMIT 1''', (now, now)).fetchone()
+                if unit is None:
+                    break
+                unit_id, category, page, url, attempts = unit
+
+                if attempts >= self.max_attempts:
+                    self.db.execute("UPDATE units SET status = 'failed' WHERE unit_id = ?", (unit_id,))
+                    continue
+
+                self.db.execute(
+                    '''UPDATE units SET status = 'leased', worker = ?, lease_expires = ?,
+                       attempts = attempts + 1 WHERE unit_id = ?''',
+                    (worker, now + self.lease_seconds, unit_id))
+                unit = {'unit_id': unit_id, 'category': category, 'page': page, 'url': url}
+                break
+            self.db.execute('COMMIT')
+        except Exception:
+            self.db.execute('ROLLBACK')
+            raise
+        return unit
+
+    def _owned_update(self, sql, unit_id, worker, params=()):
+        cursor = self.db.execute(
+            sql + " WHERE unit_id = ? AND worker = ? AND status = 'leased'",
+            params + (unit_id, worker))
+        return cursor.rowcount == 1
+
+    def release(self, unit_id, worker):
+        """Give the unit back to the queue after a failed download.
+
+        It is claimed again after `retry_seconds`, doubled at every attempt.
+        """
+        return self._owned_update(
+            '''UPDATE units SET status = 'pending', worker = NULL,
+               lease_expires = ? + ? * (1 << (attempts - 1))''',
+            unit_id, worker, (time.time(), self.retry_seconds))
+
+    def complete(self, unit_id, worker, items):
+        """Store the items of the unit.
+
+        Returns False when the lease was lost to another worker, in which
+        case the items are discarded.
+        """
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            owned = self._owned_update("UPDATE units SET status = 'done'", unit_id, worker)
+            if owned:
+                self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?)',
+                                (unit_id, json.dumps(items)))
+            self.db.execute('COMMIT')
+        except Exception:
+            self.db.execute('ROLLBACK')
+            raise
+        return owned
+
+    def counts(self):
+        """Number of units per status."""
+        return dict(self.db.execute('SELECT status, COUNT(*) FROM units GROUP BY status'))
+
+    def is_finished(self):
+        counts = self.counts()
+        return not counts.get('pending') and not counts.get('leased')
+
+    def items(self, category):
+        """Items of every done unit of the category, in page order."""
+        rows = self.db.execute(
+            '''SELECT r.items FROM results r JOIN units u USING (unit_id)
+               WHERE u.category = ? AND u.status = 'done' ORDER BY u.page''', (category,))
+        return [item for (items,) in rows for item in json.loads(items)]
+
+
+# # Worker
+
+def run_worker(queue_path, worker_id=None, fetch=fetch_json, poll_seconds=1.0, **queue_options):
+    """Claim and process units until the queue is finished.
+
+    Returns the number of units completed by this worker.
+    """
+    worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+    queue = WorkQueue(queue_path, **queue_options)
+    completed = 0
+
+    try:
+        while True:
+            unit = queue.claim(worker_id)
+            if unit is None:
+                # units leased by other workers may still expire and come back
+                if queue.is_finished():
+                    break
+                time.sleep(poll_seconds)
+                continue
+
+            try:
+                items = fetch(unit['url'])['results']
+            except Exception as e:
+                print(f"Error in {unit['url']}: {e}")
+                queue.release(unit['unit_id'], worker_id)
+                continue
+
+            for item in items:
+                # remove created and edited fields
+                item.pop('created', None)
+                item.pop('edited', None)
+
+            if queue.complete(unit['unit_id'], worker_id, items):
+                completed += 1
+    finally:
+        queue.close()
+
+    return completed
+
+
+# # Coordinator
+
+def plan(queue, base_urls, fetch=fetch_json):
+    """Queue one unit per page of every category, using the SWAPI `count`.
+
+    The units and results of a previous run are removed first, so every run
+    downloads the pages again.
+    """
+    queue.clear()
+    for cat, url in base_urls.items():
+        first_page = fetch(url)
+        page_size = len(first_page['results']) or 1
+        pages = math.ceil(first_page['count'] / page_size)
+        queue.enqueue(cat, url, range(1, pages + 1))
+
+
+def merge(queue, categories):
+    """Raw items of every category, with the layout of starwars_raw.json."""
+    counts = queue.counts()
+    if counts.get('failed'):
+        raise RuntimeError(f"{counts['failed']} work units failed after {queue.max_attempts} attempts")
+    if not queue.is_finished():
+        # the workers stopped (crashed or killed) before processing every unit
+        raise RuntimeError(f'Work queue not finished: {counts}')
+    return {cat: queue.items(cat) for cat in categories}
+
+
+def run_local(queue_path, base_urls=base_urls, workers=4):
+    """Plan the units, process them with local worker processes and merge."""
+    queue = WorkQueue(queue_path)
+    try:
+        plan(queue, base_urls)
+        processes = [subprocess.Popen([sys.executable, os.path.abspath(__file__), 'worker', queue_path])
+                     for _ in range(workers)]
+        for process in processes:
+            process.wait()
+
+        # a dead worker is not an error while the others processed its units,
+        # merge raises when the queue is incomplete
+        failed_workers = [p.pid for p in processes if p.returncode != 0]
+        if failed_workers:
+            print(f'Workers {failed_workers} exited with an error.')
+        return merge(queue, base_urls.keys())
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distributed extraction of the SWAPI.')
+    parser.add_argument('role', choices=['coordinator', 'worker'])
+    parser.add_argument('queue', help='path of the SQLite work queue shared by the workers')
+    parser.add_argument('--workers', type=int, default=4, help='local workers (coordinator only)')
+    parser.add_argument('--output', default='../data/starwars_raw.json',
+                        help='merged raw json (coordinator only)')
+    args = parser.parse_args()
+
+    if args.role == 'worker':
+        print(f'Worker finished: {run_worker(args.queue)} units completed.')
+    else:
+        raw_dict = run_local(args.queue, workers=args.workers)
+        with open(args.output, 'w') as file:
+            json.dump(raw_dict, file, indent=4)
+        print(f'Content from Star Wars API stored in {args.output}!')
@@ -0,0 +1,190 @@
+"""Compact in-memory representation of the SWAPI items.
+
+Each category is held as a struct of arrays instead of a list of dicts:
+
+* the item ids live in a single integer array and the `url` column is
+  rebuilt from the category url prefix and the id,
+* repetitive text values (colors, genders, climates...) are interned, so
+  equal values share one string object,
+* link fields are stored as integer ids: single-valued fields (homeworld,
+  species) as one array, multi-valued fields as CSR style offsets + values
+  arrays.
+
+The store is filled either from the raw API items or from the processed
+items cache and can build the category DataFrame directly from its arrays.
+"""
+
+import sys
+from array import array
+
+import numpy as np
+import pandas as pd
+
+
+# value used in the single link arrays when the field is empty
+MISSING_ID = -1
+
+
+def url_to_id(url):
+    """Return the integer id at the end of a SWAPI url ('.../people/1/' -> 1)."""
+    return int(url.rstrip('/').rsplit('/', 1)[-1])
+
+
+def url_prefix(url):
+    """Return the url without the trailing id ('.../people/1/' -> '.../people/')."""
+    return url.rstrip('/').rsplit('/', 1)[0] + '/'
+
+
+def is_single_link(field):
+    """Homeworld and species hold a single id once processed."""
+    return field in ('homeworld', 'species')
+
+
+def _intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class CategoryStore:
+    """Struct of arrays holding every item of one category."""
+
+    __slots__ = ('category', 'fields', 'columns', 'prefix',
+                 'ids', 'scalars', 'single_links', 'multi_links')
+
+    def __init__(self, category, fields):
+        self.category = category
+        self.fields = list(fields)
+        # original key order of the items, used to build the DataFrame
+        self.columns = None
+        self.prefix = None
+        self.ids = array('q')
+        # column -> list of (interned) scalar values
+        self.scalars = {}
+        # field -> array of ids (MISSING_ID when empty)
+        self.single_links = {f: array('q') for f in self.fields if is_single_link(f)}
+        # field -> (offsets, values), values of row i are values[offsets[i]:offsets[i+1]]
+        self.multi_links = {f: (array('q', [0]), array('q'))
+                            for f in self.fields if not is_single_link(f)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ## Filling the store
+
+    @classmethod
+    def from_raw_items(cls, category, items, fields):
+        """Build the store from the items returned by the API.
+
+        A malformed item is reported and skipped, the other items are kept.
+        """
+        store = cls(category, fields)
+        for item in items:
+            try:
+                store.append_raw(item)
+            except Exception as e:
+                print(f"Error in {category} item {item.get('url') if isinstance(item, dict) else item}: {e!r}")
+        return store
+
+    @classmethod
+    def from_processed_items(cls, category, items, fields):
+        """Build the store from the items of starwars_processed_items.json."""
+        store = cls(category, fields)
+        for item in items:
+            store.append_processed(item)
+        return store
+
+    def _start_row(self, item):
+        item_id = url_to_id(item['url'])
+        if self.columns is None:
+            self.columns = [key for key in item.keys()
+                            if key not in ('created', 'edited', 'id')] + ['id']
+            self.prefix = sys.intern(url_prefix(item['url']))
+            self.scalars = {col: [] for col in self.columns
+                            if col not in self.fields and col not in ('id', 'url')}
+
+        if url_prefix(item['url']) != self.prefix:
+            raise ValueError(f"Unexpected url {item['url']} in category '{self.category}'")
+
+        self.ids.append(item_id)
+        for col, values in self.scalars.items():
+            values.append(_intern(item.get(col)))
+
+    def _append_multi(self, field, ids):
+        offsets, values = self.multi_links[field]
+        values.extend(ids)
+        offsets.append(len(values))
+
+    def append_raw(self, item):
+        """Add one raw item (links as urls), following the processing rules of the pipeline."""
+        # parse every link before adding anything, so a malformed item
+        # leaves the arrays untouched
+        links = {}
+        for field in self.fields:
+            value = item[field]
+            if field == 'homeworld':
+                links[field] = url_to_id(value) if value else MISSING_ID
+            elif field == 'species':
+                # an empty species field means the character is a human (id 1)
+                links[field] = url_to_id(value[0]) if value else 1
+            else:
+                links[field] = [url_to_id(link) for link in value]
+
+        self._start_row(item)
+        for field, value in links.items():
+            if is_single_link(field):
+                self.single_links[field].append(value)
+            else:
+                self._append_multi(field, value)
+
+    def append_processed(self, item):
+        """Add one processed item (links already parsed into ids)."""
+        self._start_row(item)
+        for field in self.fields:
+            value = item[field]
+            if is_single_link(field):
+                # empty single links are stored as an empty list in the json file
+                self.single_links[field].append(value if isinstance(value, int) else MISSING_ID)
+            else:
+                self._append_multi(field, value)
+
+    # ## Reading the store
+
+    def url(self, row):
+        return f'{self.prefix}{self.ids[row]}/'
+
+    def link_ids(self, field, row):
+        """Tuple of ids of a multi-valued link field for one row."""
+        offsets, values = self.multi_links[field]
+        return tuple(values[offsets[row]:offsets[row + 1]])
+
+    def _link_column(self, field):
+        if is_single_link(field):
+            # an empty single link is an empty tuple, as in the processed json
+            return [i if i != MISSING_ID else () for i in self.single_links[field]]
+        # one tuple per row: the layout written to the csv files and exploded
+        # into the junction tables
+        return [self.link_ids(field, row) for row in range(len(self))]
+
+    def to_items(self):
+        """Processed items as dicts, in the layout of starwars_processed_items.json."""
+        columns = {col: self.column(col) for col in self.columns}
+        return [{col: columns[col][row] for col in self.columns} for row in range(len(self))]
+
+    def column(self, col):
+        if col == 'id':
+            return self.ids.tolist()
+        if col == 'url':
+            return [self.url(row) for row in range(len(self))]
+        if col in self.scalars:
+            return self.scalars[col]
+        return self._link_column(col)
+
+    def to_dataframe(self):
+        """Build the category DataFrame (same layout as a DataFrame of the processed items)."""
+        if self.columns is None:
+            return pd.DataFrame()
+        data = {col: self.column(col) for col in self.columns}
+        # ids go straight from the array buffer to an int64 column
+        data['id'] = np.array(self.ids, dtype=np.int64)
+        return pd.DataFrame(data, columns=self.columns)
@@ -0,0 +1,224 @@
+"""Memory-mapped id lookup tables.
+
+For every category the lookup folder holds .npy files built from the
+category store (see *swapi_entities.py*):
+
+    <cat>.ids.npy     sorted item ids
+    <cat>.rows.npy    row of each sorted id in the store / category dataframe
+    <cat>.dense.npy   row of every id from 0 to the max id (-1 when missing)
+    lookup.json       url prefix, number of items and link fields of every category
+
+and the id columns of the store the rows point into:
+
+    <cat>.store.ids.npy                  item ids, in row order
+    <cat>.<field>.npy                    single link field (-1 when empty)
+    <cat>.<field>.offsets.npy / .values.npy
+                                         multi link field, ids of row i are
+                                         values[offsets[i]:offsets[i + 1]]
+
+The files are opened with `mmap_mode='r'`, so any number of processes share
+the same pages from the OS cache and resolve ids and links without parsing
+the json caches or rebuilding the store or the dataframes.
+
+Every build writes a new generation folder (gen-<time>) and then replaces
+the CURRENT file, holding the name of the generation, in a single atomic
+rename. A reader reads CURRENT first and maps the files of that generation
+only, so it never mixes the files of two builds. The previous generation
+is kept for the readers opening it during the build, older ones are removed.
+The dense table gives the row of an id in O(1); it is only written when the
+ids are not too sparse, otherwise the sorted ids are searched in O(log n).
+"""
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from swapi_entities import MISSING_ID, url_prefix, url_to_id
+
+
+META_FILE = 'lookup.json'
+CURRENT_FILE = 'CURRENT'
+
+# generations kept besides the current one
+KEEP_GENERATIONS = 1
+
+# no dense table when it would be more than DENSE_FACTOR times the number of items
+DENSE_FACTOR = 8
+
+
+def current_directory(directory):
+    """Folder of the current generation, `directory` itself when it has none."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), 'r') as file:
+            return os.path.join(directory, file.read().strip())
+    except FileNotFoundError:
+        return directory
+
+
+def build_lookup(directory, category, ids, prefix, links=None):
+    """Write the lookup files of one category into `directory`; `ids` are in row order.
+
+    `links` ({field: array of ids or (offsets, values)}) are the link
+    columns of the store, written next to the index. The files are written
+    in place: use `build_lookups` to update a folder other processes read.
+    """
+    links = links or {}
+    os.makedirs(directory, exist_ok=True)
+    ids = np.asarray(ids, dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+
+    np.save(os.path.join(directory, f'{category}.ids.npy'), ids[order])
+    np.save(os.path.join(directory, f'{category}.rows.npy'), order.astype(np.int64))
+    np.save(os.path.join(directory, f'{category}.store.ids.npy'), ids)
+
+    for field, column in links.items():
+        if isinstance(column, tuple):
+            offsets, values = column
+            np.save(os.path.join(directory, f'{category}.{field}.offsets.npy'), np.asarray(offsets, dtype=np.int64))
+            np.save(os.path.join(directory, f'{category}.{field}.values.npy'), np.asarray(values, dtype=np.int64))
+        else:
+            np.save(os.path.join(directory, f'{category}.{field}.npy'), np.asarray(column, dtype=np.int64))
+
+    dense_path = os.path.join(directory, f'{category}.dense.npy')
+    max_id = int(ids.max()) if len(ids) else 0
+    if max_id < DENSE_FACTOR * max(len(ids), 1):
+        dense = np.full(max_id + 1, -1, dtype=np.int64)
+        dense[ids] = np.arange(len(ids), dtype=np.int64)
+        np.save(dense_path, dense)
+    elif os.path.exists(dense_path):
+        os.remove(dense_path)
+
+    meta_path = os.path.join(directory, META_FILE)
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as file:
+            meta = json.load(file)
+    meta[category] = {
+        'prefix': prefix,
+        'count': len(ids),
+        'single_links': [f for f, column in links.items() if not isinstance(column, tuple)],
+        'multi_links': [f for f, column in links.items() if isinstance(column, tuple)],
+    }
+    with open(meta_path, 'w') as file:
+        json.dump(meta, file, indent=4)
+
+
+def build_lookups(directory, stores):
+    """Write the lookup files of every category store ({category: CategoryStore}).
+
+    The files go into a new generation folder, which becomes the current
+    one once every category is written. Returns the generation folder.
+    """
+    os.makedirs(directory, exist_ok=True)
+    generation = f'gen-{time.time_ns()}'
+    os.makedirs(os.path.join(directory, generation))
+    for cat, store in stores.items():
+        links = dict(store.single_links)
+        links.update(store.multi_links)
+        build_lookup(os.path.join(directory, generation), cat,
+                     np.array(store.ids, dtype=np.int64), store.prefix, links)
+
+    # switch the readers to the new generation in one atomic rename
+    current_path = os.path.join(directory, CURRENT_FILE)
+    with open(current_path + '.tmp', 'w') as file:
+        file.write(generation)
+    os.replace(current_path + '.tmp', current_path)
+
+    generations = sorted((name for name in os.listdir(directory) if name.startswith('gen-')),
+                         key=lambda name: int(name[4:]))
+    for name in generations[:-(KEEP_GENERATIONS + 1)]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    return os.path.join(directory, generation)
+
+
+class IdLookup:
+    """Read-only id -> row and url -> id resolution for one category."""
+
+    def __init__(self, directory, category):
+        self.category = category
+        # every file is read from the same generation
+        directory = current_directory(directory)
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), 'r') as file:
+            meta = json.load(file)[category]
+        self.prefix = meta['prefix']
+
+        def load(name):
+            return np.load(os.path.join(directory, f'{category}.{name}.npy'), mmap_mode='r')
+
+        # store columns, indexed by row
+        self.store_ids = load('store.ids')
+        self.single_links = {field: load(field) for field in meta.get('single_links', [])}
+        self.multi_links = {field: (load(f'{field}.offsets'), load(f'{field}.values'))
+                            for field in meta.get('multi_links', [])}
+
+        self.ids = np.load(os.path.join(directory, f'{category}.ids.npy'), mmap_mode='r')
+        self.sorted_rows = np.load(os.path.join(directory, f'{category}.rows.npy'), mmap_mode='r')
+        dense_path = os.path.join(directory, f'{category}.dense.npy')
+        self.dense = np.load(dense_path, mmap_mode='r') if os.path.exists(dense_path) else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return self.find(item_id) >= 0
+
+    def find(self, item_id):
+        """Row of `item_id`, -1 when the id does not exist."""
+        if self.dense is not None:
+            if 0 <= item_id < len(self.dense):
+                return int(self.dense[item_id])
+            return -1
+        pos = int(np.searchsorted(self.ids, item_id))
+        if pos < len(self.ids) and self.ids[pos] == item_id:
+            return int(self.sorted_rows[pos])
+        return -1
+
+    def row(self, item_id):
+        """Row of `item_id` in the category store / dataframe."""
+        row = self.find(item_id)
+        if row < 0:
+            raise KeyError(f'{self.category} item {item_id} not found')
+        return row
+
+    def rows(self, ids):
+        """Rows of an array of ids (-1 for the missing ones)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self.ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        if self.dense is not None:
+            rows = np.full(len(ids), -1, dtype=np.int64)
+            valid = (ids >= 0) & (ids < len(self.dense))
+            rows[valid] = self.dense[ids[valid]]
+            return rows
+        pos = np.searchsorted(self.ids, ids).clip(max=len(self.ids) - 1)
+        return np.where(self.ids[pos] == ids, self.sorted_rows[pos], -1)
+
+    def url_to_id(self, url):
+        """Id of an item url of this category."""
+        if url_prefix(url) != self.prefix:
+            raise KeyError(f'{url} is not a {self.category} url')
+        item_id = url_to_id(url)
+        if item_id not in self:
+            raise KeyError(f'{self.category} item {item_id} not found')
+        return item_id
+
+    def url_to_row(self, url):
+        return self.row(self.url_to_id(url))
+
+    def links(self, field, item_id):
+        """Linked ids of an item.
+
+        Single link fields give one id (None when empty), multi link fields
+        an array of ids.
+        """
+        row = self.row(item_id)
+        if field in self.single_links:
+            linked = int(self.single_links[field][row])
+            return None if linked == MISSING_ID else linked
+        offsets, values = self.multi_links[field]
+        return values[offsets[row]:offsets[row + 1]]
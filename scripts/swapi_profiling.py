@@ -0,0 +1,142 @@
+"""Profiling of the database load.
+
+LoadProfiler attaches to a SQLAlchemy engine and records, for every table
+being loaded:
+
+* the latency and the number of rows of every SQL statement (the rows of an
+  INSERT statement are the chunk size used by `to_sql`; the rows of the
+  other statements are recorded but left out of the summary),
+* the time spent waiting for a connection from the pool.
+
+The statements are attributed to the table set with `profiler.table(name)`.
+The records can be summarized in a DataFrame or exported as folded stacks,
+the input format of flamegraph.pl, speedscope and similar tools.
+"""
+
+import os
+from contextlib import contextmanager
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+
+
+class LoadProfiler:
+
+    def __init__(self):
+        # one record per statement: (table, kind, rows, seconds)
+        self.statements = []
+        # one record per connection checkout: (table, seconds)
+        self.checkouts = []
+        self._table = None
+        self._engine = None
+
+    # ## Engine instrumentation
+
+    def attach(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+        # the pool has no event fired before a checkout, so time the call made
+        # by every new Connection to get a DBAPI connection from the pool (the
+        # wait for a free connection, plus the connect when the pool opens one).
+        # It is set on the engine, not on the pool, so it survives `dispose()`
+        # replacing the pool.
+        raw_connection = engine.raw_connection
+
+        def timed_raw_connection():
+            start = perf_counter()
+            try:
+                return raw_connection()
+            finally:
+                self.checkouts.append((self._table, perf_counter() - start))
+
+        engine.raw_connection = timed_raw_connection
+        self._engine = engine
+        return self
+
+    def detach(self):
+        if self._engine is None:
+            return
+        event.remove(self._engine, 'before_cursor_execute', self._before_execute)
+        event.remove(self._engine, 'after_cursor_execute', self._after_execute)
+        self._engine.__dict__.pop('raw_connection', None)
+        self._engine = None
+
+    @contextmanager
+    def table(self, name):
+        """Attribute the statements run inside the block to table `name`."""
+        previous, self._table = self._table, name
+        try:
+            yield
+        finally:
+            self._table = previous
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profile_start', []).append(perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info['profile_start'].pop()
+        if cursor.rowcount >= 0:
+            rows = cursor.rowcount
+        else:
+            rows = len(parameters) if executemany else 0
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        self.statements.append((self._table, kind, rows, elapsed))
+
+    # ## Reports
+
+    def summary(self):
+        """One row per table with the statement and checkout statistics.
+
+        The rows and latency columns only count the INSERT statements, the
+        ones the chunk size applies to; the introspection and DDL statements
+        run by `to_sql` are reported apart in `other_statements`/`other_s`.
+        """
+        columns = ['table', 'kind', 'rows', 'seconds']
+        statements = pd.DataFrame(self.statements, columns=columns)
+        statements['table'] = statements['table'].fillna('(other)')
+        is_insert = statements['kind'] == 'INSERT'
+        tables = pd.Index(statements['table'].unique(), name='table')
+
+        summary = statements[is_insert].groupby('table', sort=False).agg(
+            statements=('seconds', 'size'),
+            rows=('rows', 'sum'),
+            max_rows_per_statement=('rows', 'max'),
+            total_s=('seconds', 'sum'),
+            p50_ms=('seconds', lambda s: np.percentile(s, 50) * 1000),
+            p99_ms=('seconds', lambda s: np.percentile(s, 99) * 1000),
+        ).reindex(tables)
+        summary['statements'] = summary['statements'].fillna(0).astype('int64')
+        summary['rows'] = summary['rows'].fillna(0).astype('int64')
+        summary['total_s'] = summary['total_s'].fillna(0.0)
+        summary['rows_per_statement'] = summary['rows'] / summary['statements'].replace(0, np.nan)
+
+        others = statements[~is_insert].groupby('table', sort=False)['seconds'].agg(['size', 'sum'])
+        summary['other_statements'] = others['size'].reindex(tables).fillna(0).astype('int64')
+        summary['other_s'] = others['sum'].reindex(tables).fillna(0.0)
+
+        checkouts = pd.DataFrame(self.checkouts, columns=['table', 'seconds'])
+        checkouts['table'] = checkouts['table'].fillna('(other)')
+        checkouts = checkouts.groupby('table', sort=False)['seconds'].agg(['size', 'sum'])
+        summary['checkouts'] = checkouts['size'].reindex(summary.index).fillna(0).astype('int64')
+        summary['checkout_wait_s'] = checkouts['sum'].reindex(summary.index).fillna(0.0)
+
+        return summary.reset_index()
+
+    def folded_stacks(self):
+        """Lines 'load;<table>;<statement kind> <microseconds>', one per stack."""
+        totals = {}
+        for table, kind, _, seconds in self.statements:
+            stack = f"load;{table or '(other)'};{kind}"
+            totals[stack] = totals.get(stack, 0.0) + seconds
+        for table, seconds in self.checkouts:
+            stack = f"load;{table or '(other)'};checkout"
+            totals[stack] = totals.get(stack, 0.0) + seconds
+        return [f'{stack} {round(seconds * 1e6)}' for stack, seconds in totals.items()]
+
+    def write_folded(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as file:
+            file.write('\n'.join(self.folded_stacks()) + '\n')
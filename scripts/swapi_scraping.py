@@ -9,6 +9,15 @@ import json
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 import copy
+from datetime import date, datetime
+
+from swapi_entities import CategoryStore
+from swapi_archive import RawArchive
+from swapi_distributed import run_local
+from swapi_changelog import build_changelog, load_snapshot, save_snapshot, take_snapshot, write_changelog
+from swapi_profiling import LoadProfiler
+from swapi_export import export_csvs
+from swapi_lookup import build_lookups
 
 
 # # Definitions
@@ -26,6 +35,9 @@ base_urls = {
 categories = list(base_urls.keys())
 categories
 
+# number of worker processes used to scrape the API (1: scrape in this process)
+SWAPI_WORKERS = int(os.getenv("SWAPI_WORKERS", "1"))
+
 
 # Each category has different fields that contain information in the form of an url. I will extract the page id from those fields for each category. 
 
@@ -82,9 +94,15 @@ def scrape_category(url):
 
 # %%
 if not os.path.exists('../data/starwars_raw.json'):
-    raw_dict = {cat : scrape_category(base_urls[cat]) for cat in categories}
+    os.makedirs('../data', exist_ok=True)
+
+    # with SWAPI_WORKERS set, the pages are downloaded by parallel worker processes
+    # sharing a work queue (see *swapi_distributed.py*)
+    if SWAPI_WORKERS > 1:
+        raw_dict = run_local('../data/work_queue.sqlite', base_urls, workers=SWAPI_WORKERS)
+    else:
+        raw_dict = {cat : scrape_category(base_urls[cat]) for cat in categories}
     
-    os.makedirs('../data')
     # store into a json file
     with open('../data/starwars_raw.json', 'w') as file:
         json.dump(raw_dict, file, indent=4 )
@@ -96,110 +114,55 @@ else:
         raw_dict = json.load(file)
 
 
-# Function to process the information of an item from a category.
-# Ex. one character, one planet or one film.
+# ## Keep a snapshot of the raw data in the compressed archive
+# Items that did not change since a previous snapshot are not stored again.
 
 # %%
-def process_item(item, fields):
-
-    # create a copy of the item dictionary
-    item = copy.deepcopy(item)
-
-    # parse the links from starships, vehicles and species
-    for field in fields:
-        #print(f'Processing field: {field}')
-        id_values = []
-                        
-        if item[field]:  # if the field is not empty
-            
-            # parse the homeworld (just a single string value)
-            if field == 'homeworld':
-                item[field] = int(item[field].split('/')[-2])
-
-            # the content of the item[field] is a list
-            # of links (empty or just one link in case of species)
-            else:
-                # species field needs special treatment
-                if field == 'species':
-                    item['species'] = int(item['species'][0].split('/')[-2])
-                    # process done, keep on with next field
-                    # species contains only one value,
-                    # so don't convert into tuple
-                    continue
-
-                # traverse the list of links for fields
-                # other than homeworld and species
-                else:
-                    for link in item[field]:
-                        # parse the id value in the link    
-                        id_values.append(int(link.split('/')[-2]))
-
-                # add the id values into the corresponding field key
-                # convert list into tuple, as tuples are hashable
-                item[field] = tuple(id_values)
-                    
-        # field has no values (empty list)
-        else:
-            # species field may be empty, but that means
-            # she/he is a human, so set species = 1
-            if field == 'species':
-                item['species'] = 1
-            # otherwise, it is a field supposed to be empty
-            else:
-                item[field] = ()
-    
-    # add the id, extracted from the url
-    item['id'] = int(item['url'].split('/')[-2])
-    
-    # remove created and edited fields
-    try:
-        del(item['created'])
-        del(item['edited'])
-    except:
-        pass
+archive = RawArchive('../data/raw_archive')
+n_items, n_new = archive.write_snapshot(date.today().isoformat(), raw_dict)
+print(f'Raw snapshot archived: {n_items} items, {n_new} new payloads stored.')
 
-    return item
 
+# Process the items of each category into a compact store (see *swapi_entities.py*):
+# the links are parsed into integer ids, repeated text values are interned and
+# every field is kept as an array instead of one dict per item.
 
 # # Store the processed data
 
 # %%
 if not os.path.exists('../data/starwars_processed_items.json'):
     # dictionary to store the processed categories
-    processed_dict = {}
-    
-    # process each item for all the categories
+    stores = {}
+
+    # process each item for all the categories (malformed items are reported and skipped)
     for k,v in raw_dict.items():
-        items_processed = []
-        for item in v:
-            try:
-                items_processed.append(process_item(item, fields[k]))
-                processed_dict[k] = items_processed
-            except:
-                print(f'Error in {k}')
-    
+        stores[k] = CategoryStore.from_raw_items(k, v, fields[k])
+
     # store the information in a json file
     with open('../data/starwars_processed_items.json', 'w') as file:
-        json.dump(processed_dict, file, indent = 4)
+        json.dump({cat: store.to_items() for cat, store in stores.items()}, file, indent = 4)
 
 # the file already exists, so load it
 else:
     with open('../data/starwars_processed_items.json', 'r') as file:
-        processed_dict= json.load(file)
+        processed_dict = json.load(file)
+
+    stores = {cat : CategoryStore.from_processed_items(cat, processed_dict[cat], fields[cat])
+              for cat in categories}
+    del processed_dict
+
+    print('Processed data already existed, so the category stores will be created from json file.')
 
-        # convert lists into tuples after reading from json file
-        for cat in categories:
-            for item in processed_dict[cat]:
-                for field in fields[cat]:
-                    try:
-                        item[field] = tuple(item[field])
-                    # the content of the field is an integer
-                    # and not a list. Cannot create a tuple from
-                    # an integer using tuple(int)
-                    except:
-                        pass  # do not convert into a tuple, leave it as integer
+# the raw items are archived and parsed into the stores, free them
+del raw_dict
 
-    print('Processed data already existed, so the *categories_dict_processed* dictionary will be created from json file.')
+
+# ## Id lookup tables
+# Memory-mapped id -> row tables of every category, shared by the workers and
+# the read-side services (see *swapi_lookup.py*).
+
+# %%
+build_lookups('../data/lookup', stores)
 
 
 # # Dataframes
@@ -213,8 +176,8 @@ dataframes = dict.fromkeys(categories)
 
 # %%
 for cat in categories:
-    df = pd.DataFrame(processed_dict[cat])
-    #df['id'] = df.index + 1
+    # build the dataframe straight from the arrays of the store
+    df = stores[cat].to_dataframe()
 
     # rename columns to add '_id' to the "fields"
     rename_dict = {field : f'{field}_id' for field in fields[cat]}
@@ -415,19 +378,17 @@ for col in ['cost_in_credits', 'length', 'max_atmosphering_speed', 'crew', 'pass
 
 
 # ## Export clean datasets into csv files
+# The files are written in parallel and only when the dataframe changed since
+# the last export (see *swapi_export.py*).
 
 # %%
 data_path = '../data'
-for cat in categories:
-    filename = f'{cat}_dataframe.csv'
-    if os.path.exists(f'{data_path}/csv/{filename}'):
-        print(f'File {filename} already exist!')
-        pass
-    else:
-        os.makedirs(f'{data_path}/csv/', exist_ok=True)
-        df = dataframes[cat]
-        df.to_csv(f'{data_path}/csv/{cat}_dataframe.csv', index = False)
-print(f'Dataframes of each normalized category are stored in {data_path}/csv/ as csv files!')
+CSV_COMPRESSION = os.getenv("CSV_COMPRESSION") or None
+
+status = export_csvs(dataframes, f'{data_path}/csv', '{name}_dataframe.csv', CSV_COMPRESSION)
+for cat, state in status.items():
+    print(f'File {cat}_dataframe.csv {state}!')
+print(f'Dataframes of each category are stored in {data_path}/csv/ as csv files!')
 
 
 # # Junction tables
@@ -547,20 +508,35 @@ for cat in dataframes_normalized.keys():
     dataframes_normalized[cat].drop(columns_to_drop[cat], axis='columns', inplace = True)
 
 
-# ## Store the normalized dataframes
+# ## Store the normalized dataframes and the junction tables
 
 # %%
-data_path = '../data'
-for cat in categories:
-    filename = f'{cat}_dataframe.csv'
-    if os.path.exists(f'{data_path}/csv_normalized/{filename}'):
-        print(f'File {filename} already exist!')
-        pass
-    else:
-        os.makedirs(f'{data_path}/csv_normalized/', exist_ok=True)
-        df = dataframes_normalized[cat]
-        df.to_csv(f'{data_path}/csv_normalized/{cat}_dataframe_normalized.csv', index = False)
-print(f'Dataframes of each normalized category are stored in {data_path}/csv_normalized/ as csv files!')
+status = export_csvs(dataframes_normalized, f'{data_path}/csv_normalized',
+                     '{name}_dataframe_normalized.csv', CSV_COMPRESSION)
+status.update(export_csvs(junction_tables_dict, f'{data_path}/csv_normalized',
+                          '{name}.csv', CSV_COMPRESSION))
+for name, state in status.items():
+    print(f'File for {name} {state}!')
+print(f'Dataframes of each normalized category and junction tables are stored in {data_path}/csv_normalized/ as csv files!')
+
+
+# # Changes since the previous run
+# Compare the normalized tables and the junction tables with the snapshot of the
+# previous run and store the inserts, updates and deletes in a NDJSON changelog.
+
+# %%
+changelog_path = f'{data_path}/changelog'
+previous_snapshot = load_snapshot(f'{changelog_path}/snapshot.json')
+changes = build_changelog(dataframes_normalized, junction_tables_dict, previous_snapshot)
+
+if changes:
+    run_stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+    write_changelog(changes, f'{changelog_path}/changes_{run_stamp}.ndjson')
+    print(f'{len(changes)} changes since the previous run stored in {changelog_path}/changes_{run_stamp}.ndjson')
+else:
+    print('No changes since the previous run!')
+
+save_snapshot(take_snapshot(dataframes_normalized, junction_tables_dict), f'{changelog_path}/snapshot.json')
 
 
 # # Insert data into the database
@@ -577,6 +553,10 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
+# optional load tuning and profiling
+DB_CHUNKSIZE = int(os.getenv("DB_CHUNKSIZE")) if os.getenv("DB_CHUNKSIZE") else None
+PROFILE_LOAD = os.getenv("PROFILE_LOAD", "").lower() in ("1", "true", "yes")
+
 
 # ## Create the db connection
 
@@ -592,6 +572,12 @@ try:
 except Exception as e:
     print(f"Error creating engine: {e}")
 
+# %%
+# with PROFILE_LOAD enabled, every statement and connection checkout of the load is timed
+profiler = LoadProfiler()
+if PROFILE_LOAD:
+    profiler.attach(engine)
+
 
 # ## Populate the data into the database
 # 
@@ -613,7 +599,8 @@ categories_sorted = ['planets', 'species', 'vehicles', 'starships', 'films', 'pe
 def insert_category(cat, dictionary):
     df = dictionary[cat]
     try:
-        df.to_sql(name=cat, con=engine, if_exists='append', index=False)
+        with profiler.table(cat):
+            df.to_sql(name=cat, con=engine, if_exists='append', index=False, chunksize=DB_CHUNKSIZE)
         print(f"DataFrame for category '{cat}' inserted successfully into the database. ✅\n")
     except Exception as e:
         print(f"\\ Error inserting DataFrame for category '{cat}': \n{e}\n\n")
@@ -639,6 +626,17 @@ for table in junction_tables_dict.keys():
     else:
         print(f'{table} table already exists in database!') 
 
+# ### Load profiling report
+
+# %%
+if PROFILE_LOAD:
+    profiler.detach()
+    print(profiler.summary().to_string(index=False))
+
+    trace_path = f"{data_path}/profiling/load_{datetime.now().strftime('%Y%m%dT%H%M%S')}.folded"
+    profiler.write_folded(trace_path)
+    print(f'Load trace stored in {trace_path} (folded stacks, ready for flamegraph.pl or speedscope).')
+
 # %%
 print('All the process finished successfully!!!')
 
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The pipeline modules live next to swapi_scraping.py and import each other
+# as top level modules (the script is run from the scripts folder).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts'))
@@ -0,0 +1,60 @@
+import os
+import pytest
+
+from swapi_archive import RawArchive
+
+@pytest.fixture
+def raw_dict():
+    """Provides raw data with the layout of starwars_raw.json."""
+    return {
+        "films": [
+            {"title": "A New Hope", "episode_id": 4, "url": "https://swapi.dev/api/films/1/"},
+            {"title": "The Empire Strikes Back", "episode_id": 5, "url": "https://swapi.dev/api/films/2/"},
+        ],
+        "planets": [
+            {"name": "Tatooine", "residents": [], "url": "https://swapi.dev/api/planets/1/"},
+        ],
+    }
+
+def test_snapshot_roundtrip(tmp_path, raw_dict):
+    """Tests that a stored snapshot is read back unchanged, keys in order."""
+    archive = RawArchive(str(tmp_path))
+    assert archive.write_snapshot('2024-01-01', raw_dict) == (3, 3)
+
+    reloaded = RawArchive(str(tmp_path)).read_snapshot('2024-01-01')
+    assert reloaded == raw_dict
+    assert list(reloaded['films'][0].keys()) == ['title', 'episode_id', 'url']
+
+def test_read_item_by_id(tmp_path, raw_dict):
+    """Tests the random access to a single item."""
+    archive = RawArchive(str(tmp_path))
+    archive.write_snapshot('2024-01-01', raw_dict)
+    assert archive.read_item('2024-01-01', 'films', 2)['episode_id'] == 5
+    with pytest.raises(KeyError):
+        archive.read_item('2024-01-01', 'films', 3)
+
+def test_unchanged_items_are_deduplicated(tmp_path, raw_dict):
+    """Tests that only the modified items of a new snapshot are stored."""
+    archive = RawArchive(str(tmp_path))
+    archive.write_snapshot('2024-01-01', raw_dict)
+    pack_size = os.path.getsize(archive.pack_path)
+
+    raw_dict['planets'][0]['residents'] = ["https://swapi.dev/api/people/1/"]
+    assert archive.write_snapshot('2024-01-02', raw_dict) == (3, 1)
+    assert os.path.getsize(archive.pack_path) > pack_size
+
+    assert archive.snapshots() == ['2024-01-01', '2024-01-02']
+    assert archive.read_item('2024-01-01', 'planets', 1)['residents'] == []
+    assert archive.read_item('2024-01-02', 'planets', 1)['residents'] != []
+
+def test_items_are_compressed_in_chunks(tmp_path, raw_dict, monkeypatch):
+    """Tests that the items of a category share chunks, split at CHUNK_SIZE."""
+    import swapi_archive
+    monkeypatch.setattr(swapi_archive, 'CHUNK_SIZE', 50)
+    archive = RawArchive(str(tmp_path))
+    archive.write_snapshot('2024-01-01', raw_dict)
+
+    chunk_offsets = {entry[0] for entry in archive.index.values()}
+    # every film payload fills a chunk on its own, the planet is the last chunk
+    assert len(chunk_offsets) == 3
+    assert RawArchive(str(tmp_path)).read_snapshot('2024-01-01') == raw_dict
@@ -0,0 +1,56 @@
+import pytest
+
+from swapi_benchmark import QUERIES, JUNCTIONS, benchmark, schema_statements, synthetic_dataset
+
+def test_schema_statements():
+    """Tests that only the CREATE TABLE statements of the schema file are kept."""
+    statements = schema_statements()
+    assert len(statements) == 13
+    assert all(s.startswith('CREATE TABLE') for s in statements)
+
+def test_synthetic_dataset_scale():
+    """Tests the size and the foreign keys of the synthetic dataset."""
+    tables, counts = synthetic_dataset(scale=2)
+    assert counts['people'] == 164
+    assert len(tables['people']) == 164
+
+    for table, (left_col, left_cat, right_col, right_cat, _) in JUNCTIONS.items():
+        edges = tables[table]
+        assert not edges.duplicated().any()
+        assert edges[left_col].between(1, counts[left_cat]).all()
+        assert edges[right_col].between(1, counts[right_cat]).all()
+
+def test_benchmark_report_on_sqlite():
+    """Tests that every query is measured with and without indexes."""
+    report = benchmark(scale=1, repeat=5, urls={'sqlite': 'sqlite://'})
+    assert len(report) == 2 * len(QUERIES)
+    assert set(report['indexes']) == {False, True}
+    assert (report['p99_ms'] >= report['p50_ms']).all()
+
+def test_benchmark_refuses_existing_tables(tmp_path):
+    """Tests that tables of a real database are neither filled nor dropped."""
+    from sqlalchemy import create_engine, inspect, text
+    url = f'sqlite:///{tmp_path / "starwars.db"}'
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE people (character_id INT PRIMARY KEY, name VARCHAR(255))'))
+        conn.execute(text("INSERT INTO people VALUES (1, 'Luke Skywalker')"))
+
+    with pytest.raises(RuntimeError):
+        benchmark(scale=1, repeat=1, urls={'sqlite': url})
+
+    assert inspect(engine).get_table_names() == ['people']
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*) FROM people')).scalar() == 1
+    engine.dispose()
+
+def test_existing_foreign_key_indexes_are_detected(monkeypatch):
+    """Tests that indexes already in the schema are reported and not created twice."""
+    import swapi_benchmark
+    statements = swapi_benchmark.schema_statements() + [
+        'CREATE INDEX fk_people_homeworld ON people (homeworld_id)']
+    monkeypatch.setattr(swapi_benchmark, 'schema_statements', lambda: statements)
+
+    report = benchmark(scale=1, repeat=1, urls={'sqlite': 'sqlite://'})
+    assert set(report['existing_indexes']) == {1}
+    assert report.loc[report['indexes'], 'added_indexes'].eq(9).all()
@@ -0,0 +1,70 @@
+import json
+import pytest
+import pandas as pd
+
+from swapi_changelog import (build_changelog, load_snapshot, save_snapshot,
+                             take_snapshot, write_changelog)
+
+@pytest.fixture
+def dataframes():
+    """Provides a normalized category table."""
+    return {
+        'planets': pd.DataFrame({
+            'planet_id': [1, 2],
+            'name': ['Tatooine', 'Alderaan'],
+            'diameter': [10465.0, 12500.0],
+        })
+    }
+
+@pytest.fixture
+def junction_tables():
+    """Provides a junction table, with a missing value as produced by explode."""
+    return {
+        'films_planets': pd.DataFrame({
+            'film_id': [1, 1, 2],
+            'planet_id': [1, 2, None],
+        })
+    }
+
+def test_first_run_is_all_inserts(dataframes, junction_tables):
+    """Tests that without a previous snapshot every row and edge is inserted."""
+    changes = build_changelog(dataframes, junction_tables, None)
+    assert [c['op'] for c in changes] == ['insert'] * 4
+    assert changes[2]['key'] == {'film_id': 1, 'planet_id': 1}
+
+def test_no_changes_between_equal_runs(tmp_path, dataframes, junction_tables):
+    """Tests that a reloaded snapshot of the same data gives no changes."""
+    path = tmp_path / 'snapshot.json'
+    save_snapshot(take_snapshot(dataframes, junction_tables), str(path))
+    previous = load_snapshot(str(path))
+    assert build_changelog(dataframes, junction_tables, previous) == []
+
+def test_inserts_updates_and_deletes(dataframes, junction_tables):
+    """Tests that modified, new and removed rows and edges are detected."""
+    previous = take_snapshot(dataframes, junction_tables)
+
+    planets = dataframes['planets']
+    planets.loc[0, 'diameter'] = 10466.0
+    dataframes['planets'] = pd.concat(
+        [planets.iloc[[0]], pd.DataFrame({'planet_id': [3], 'name': ['Yavin IV'], 'diameter': [10200.0]})],
+        ignore_index=True)
+    junction_tables['films_planets'] = pd.DataFrame({'film_id': [1, 2], 'planet_id': [1, 3]})
+
+    changes = build_changelog(dataframes, junction_tables, previous)
+    summary = [(c['op'], c['table'], c['key']) for c in changes]
+    assert summary == [
+        ('update', 'planets', {'planet_id': 1}),
+        ('insert', 'planets', {'planet_id': 3}),
+        ('delete', 'planets', {'planet_id': 2}),
+        ('insert', 'films_planets', {'film_id': 2, 'planet_id': 3}),
+        ('delete', 'films_planets', {'film_id': 1, 'planet_id': 2}),
+    ]
+    assert changes[0]['row']['diameter'] == 10466.0
+
+def test_write_changelog_ndjson(tmp_path, dataframes, junction_tables):
+    """Tests that the changelog is written with one json change per line."""
+    path = tmp_path / 'changes.ndjson'
+    write_changelog(build_changelog(dataframes, junction_tables, None), str(path))
+    lines = path.read_text().splitlines()
+    assert len(lines) == 4
+    assert json.loads(lines[0])['row']['name'] == 'Tatooine'
@@ -0,0 +1,133 @@
+import multiprocessing
+import time
+import pytest
+
+from swapi_distributed import WorkQueue, merge, plan, run_worker
+
+BASE_URLS = {
+    'people': 'https://swapi.dev/api/people/',
+    'planets': 'https://swapi.dev/api/planets/',
+}
+COUNTS = {'people': 25, 'planets': 7}
+PAGE_SIZE = 10
+
+def fake_fetch(url):
+    """Simulates a SWAPI page: COUNTS items per category, PAGE_SIZE per page."""
+    base, _, page = url.partition('?page=')
+    category = base.split('/')[-2]
+    page = int(page or 1)
+    ids = range((page - 1) * PAGE_SIZE + 1, min(page * PAGE_SIZE, COUNTS[category]) + 1)
+    return {
+        'count': COUNTS[category],
+        'results': [{'name': f'{category} {i}', 'created': 'x', 'edited': 'x',
+                     'url': f'{base}{i}/'} for i in ids],
+    }
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / 'queue.sqlite')
+
+def test_plan_splits_categories_in_pages(queue_path):
+    """Tests that one unit is queued per page of each category."""
+    queue = WorkQueue(queue_path)
+    plan(queue, BASE_URLS, fetch=fake_fetch)
+    assert queue.counts() == {'pending': 4}
+    queue.close()
+
+def test_workers_in_parallel_processes(queue_path):
+    """Tests that several worker processes share the queue and the merge is complete."""
+    queue = WorkQueue(queue_path)
+    plan(queue, BASE_URLS, fetch=fake_fetch)
+
+    ctx = multiprocessing.get_context('spawn')
+    workers = [ctx.Process(target=run_worker, args=(queue_path,),
+                           kwargs={'worker_id': f'w{i}', 'fetch': fake_fetch, 'poll_seconds': 0.1})
+               for i in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    raw_dict = merge(queue, BASE_URLS.keys())
+    assert [item['name'] for item in raw_dict['people']] == [f'people {i}' for i in range(1, 26)]
+    assert len(raw_dict['planets']) == 7
+    assert 'created' not in raw_dict['people'][0]
+    queue.close()
+
+def test_expired_lease_is_claimed_again(queue_path):
+    """Tests that the unit of a dead worker is re-queued once its lease expires."""
+    queue = WorkQueue(queue_path, lease_seconds=0.1)
+    queue.enqueue('people', BASE_URLS['people'], [1])
+
+    lost = queue.claim('dead-worker')
+    assert queue.claim('other-worker') is None
+    time.sleep(0.2)
+
+    unit = queue.claim('other-worker')
+    assert unit['unit_id'] == lost['unit_id']
+    # the first worker lost its lease, its late result is discarded
+    assert queue.complete(lost['unit_id'], 'dead-worker', []) is False
+    assert queue.complete(unit['unit_id'], 'other-worker', [{'name': 'Luke'}]) is True
+    assert queue.items('people') == [{'name': 'Luke'}]
+    queue.close()
+
+def test_unit_fails_after_max_attempts(queue_path):
+    """Tests that a unit failing on every attempt stops the merge."""
+    queue = WorkQueue(queue_path, max_attempts=2)
+    queue.enqueue('people', BASE_URLS['people'], [1])
+
+    def broken_fetch(url):
+        raise ConnectionError('SWAPI is down')
+
+    run_worker(queue_path, worker_id='w', fetch=broken_fetch, poll_seconds=0.01,
+               max_attempts=2, retry_seconds=0.01)
+    assert queue.counts() == {'failed': 1}
+    with pytest.raises(RuntimeError):
+        merge(queue, ['people'])
+    queue.close()
+
+def test_flaky_page_is_retried_after_a_backoff(queue_path):
+    """Tests that a page failing twice is retried later and the run still succeeds."""
+    queue = WorkQueue(queue_path)
+    plan(queue, {'planets': BASE_URLS['planets']}, fetch=fake_fetch)
+    calls = []
+
+    def flaky_fetch(url):
+        calls.append(time.perf_counter())
+        if len(calls) <= 2:
+            raise ConnectionError('503')
+        return fake_fetch(url)
+
+    assert run_worker(queue_path, worker_id='w', fetch=flaky_fetch, poll_seconds=0.01,
+                      retry_seconds=0.05) == 1
+    assert len(merge(queue, ['planets'])['planets']) == 7
+    # backoff of 0.05 s after the first failure, 0.1 s after the second one
+    assert calls[1] - calls[0] >= 0.05 and calls[2] - calls[1] >= 0.1
+    queue.close()
+
+def test_new_run_downloads_the_pages_again(queue_path):
+    """Tests that a second run does not return the results of the previous one."""
+    queue = WorkQueue(queue_path)
+    plan(queue, {'planets': BASE_URLS['planets']}, fetch=fake_fetch)
+    run_worker(queue_path, worker_id='w', fetch=fake_fetch)
+    assert merge(queue, ['planets'])['planets'][0]['name'] == 'planets 1'
+
+    def new_fetch(url):
+        content = fake_fetch(url)
+        for item in content['results']:
+            item['name'] = item['name'].upper()
+        return content
+
+    plan(queue, {'planets': BASE_URLS['planets']}, fetch=new_fetch)
+    assert run_worker(queue_path, worker_id='w', fetch=new_fetch) == 1
+    assert merge(queue, ['planets'])['planets'][0]['name'] == 'PLANETS 1'
+    queue.close()
+
+def test_merge_refuses_an_unfinished_queue(queue_path):
+    """Tests that the pages left by dead workers stop the merge."""
+    queue = WorkQueue(queue_path)
+    queue.enqueue('people', BASE_URLS['people'], [1])
+    with pytest.raises(RuntimeError):
+        merge(queue, ['people'])
+    queue.close()
@@ -0,0 +1,70 @@
+import pytest
+import pandas as pd
+
+from swapi_entities import CategoryStore, url_to_id
+
+PEOPLE_FIELDS = ["homeworld", "films", "species", "vehicles", "starships"]
+
+@pytest.fixture
+def raw_people():
+    """Provides raw people items as returned by the SWAPI."""
+    return [
+        {
+            "name": "Luke Skywalker",
+            "eye_color": "blue",
+            "homeworld": "https://swapi.dev/api/planets/1/",
+            "films": ["https://swapi.dev/api/films/1/", "https://swapi.dev/api/films/2/"],
+            "species": [],
+            "vehicles": [],
+            "starships": ["https://swapi.dev/api/starships/12/"],
+            "url": "https://swapi.dev/api/people/1/",
+        },
+        {
+            "name": "C-3PO",
+            "eye_color": "yellow",
+            "homeworld": "https://swapi.dev/api/planets/1/",
+            "films": ["https://swapi.dev/api/films/1/"],
+            "species": ["https://swapi.dev/api/species/2/"],
+            "vehicles": [],
+            "starships": [],
+            "url": "https://swapi.dev/api/people/2/",
+        },
+    ]
+
+def test_url_to_id():
+    """Tests that the id is parsed from the end of the url."""
+    assert url_to_id("https://swapi.dev/api/people/12/") == 12
+
+def test_store_from_raw_items(raw_people):
+    """Tests that links are parsed into ids and species defaults to human."""
+    store = CategoryStore.from_raw_items('people', raw_people, PEOPLE_FIELDS)
+    df = store.to_dataframe()
+    assert list(df.columns) == list(raw_people[0].keys()) + ['id']
+    assert df['id'].tolist() == [1, 2]
+    assert df['films'].tolist() == [(1, 2), (1,)]
+    assert df['species'].tolist() == [1, 2]
+    assert df['vehicles'].tolist() == [(), ()]
+    assert df['url'].tolist() == [item['url'] for item in raw_people]
+
+def test_store_interns_repeated_values(raw_people):
+    """Tests that equal text values share a single string object."""
+    raw_people[1]['eye_color'] = ''.join(['bl', 'ue'])
+    store = CategoryStore.from_raw_items('people', raw_people, PEOPLE_FIELDS)
+    first, second = store.scalars['eye_color']
+    assert first is second
+
+def test_store_roundtrip_processed_items(raw_people):
+    """Tests that the processed items cache rebuilds the same dataframe."""
+    store = CategoryStore.from_raw_items('people', raw_people, PEOPLE_FIELDS)
+    reloaded = CategoryStore.from_processed_items('people', store.to_items(), PEOPLE_FIELDS)
+    pd.testing.assert_frame_equal(reloaded.to_dataframe(), store.to_dataframe())
+
+def test_store_skips_malformed_items(raw_people, capsys):
+    """Tests that a malformed item is reported and skipped without touching the arrays."""
+    raw_people.insert(1, dict(raw_people[0], url="https://swapi.dev/api/people/3/",
+                              films=["https://swapi.dev/api/films/x/"]))
+    store = CategoryStore.from_raw_items('people', raw_people, PEOPLE_FIELDS)
+    df = store.to_dataframe()
+    assert df['id'].tolist() == [1, 2]
+    assert df['films'].tolist() == [(1, 2), (1,)]
+    assert 'people/3/' in capsys.readouterr().out
@@ -0,0 +1,73 @@
+import gzip
+import os
+import pytest
+import pandas as pd
+
+import swapi_export
+from swapi_export import export_csvs
+
+@pytest.fixture
+def frames():
+    """Provides a category table and a table with tuples of ids."""
+    return {
+        'films': pd.DataFrame({
+            'film_id': [1, 2],
+            'title': ['A New Hope', 'The Empire Strikes Back'],
+            'release_date': pd.to_datetime(['1977-05-25', '1980-05-17']),
+        }),
+        'planets': pd.DataFrame({
+            'planet_id': [1, 2],
+            'films_id': [(1, 2), ()],
+            'diameter': [10465.0, None],
+        }),
+    }
+
+@pytest.fixture(params=['pyarrow', 'pandas'])
+def writer(request, monkeypatch):
+    """Runs the tests with both csv writers."""
+    if request.param == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    else:
+        monkeypatch.setattr(swapi_export, 'pa', None)
+    return request.param
+
+def test_export_roundtrip(tmp_path, frames, writer):
+    """Tests that the exported files read back as the dataframes."""
+    status = export_csvs(frames, str(tmp_path), '{name}_dataframe.csv')
+    assert status == {'films': 'written', 'planets': 'written'}
+
+    films = pd.read_csv(tmp_path / 'films_dataframe.csv')
+    assert films['title'].tolist() == frames['films']['title'].tolist()
+    assert films['release_date'].tolist() == ['1977-05-25', '1980-05-17']
+    planets = pd.read_csv(tmp_path / 'planets_dataframe.csv')
+    assert planets['films_id'].tolist() == ['(1, 2)', '()']
+    assert planets['diameter'].dtype == 'float64'
+    assert planets['diameter'].isna().tolist() == [False, True]
+
+def test_float_format_matches_to_csv(tmp_path, writer):
+    """Tests that integral floats keep their decimal, as written by to_csv."""
+    export_csvs({'vehicles': pd.DataFrame({'crew': [46.0, 1.0]})}, str(tmp_path))
+    assert '46.0' in (tmp_path / 'vehicles.csv').read_text()
+    assert pd.read_csv(tmp_path / 'vehicles.csv')['crew'].dtype == 'float64'
+
+def test_floats_are_not_quoted(tmp_path):
+    """Tests that the pyarrow writer leaves the floats unquoted."""
+    pytest.importorskip('pyarrow')
+    export_csvs({'planets': pd.DataFrame({'name': ['Tatooine'], 'diameter': [10465.0],
+                                          'gravity': [0.9]})}, str(tmp_path))
+    assert (tmp_path / 'planets.csv').read_text().splitlines()[1] == '"Tatooine",10465.0,0.9'
+
+def test_unchanged_frames_are_skipped(tmp_path, frames, writer):
+    """Tests that only the files of modified dataframes are written again."""
+    export_csvs(frames, str(tmp_path))
+    frames['planets'].loc[1, 'planet_id'] = 3
+    assert export_csvs(frames, str(tmp_path)) == {'films': 'unchanged', 'planets': 'written'}
+
+    os.remove(tmp_path / 'films.csv')
+    assert export_csvs(frames, str(tmp_path))['films'] == 'written'
+
+def test_gzip_compression(tmp_path, frames, writer):
+    """Tests the compressed export."""
+    export_csvs(frames, str(tmp_path), compression='gzip')
+    with gzip.open(tmp_path / 'films.csv.gz', 'rt') as file:
+        assert 'A New Hope' in file.read()
@@ -0,0 +1,91 @@
+import os
+import numpy as np
+import pytest
+
+import swapi_lookup
+from swapi_lookup import IdLookup, build_lookup
+
+PREFIX = 'https://swapi.dev/api/starships/'
+
+@pytest.fixture(params=['dense', 'sorted'])
+def lookup(request, tmp_path, monkeypatch):
+    """Provides the lookup of a category, with and without the dense table."""
+    if request.param == 'sorted':
+        monkeypatch.setattr(swapi_lookup, 'DENSE_FACTOR', 0)
+    # ids in row order, as scraped (not sorted, with gaps)
+    build_lookup(str(tmp_path), 'starships', [5, 2, 9, 3], PREFIX)
+    return IdLookup(str(tmp_path), 'starships')
+
+def test_lookup_uses_memory_map(lookup):
+    """Tests that the tables are memory-mapped and not loaded in memory."""
+    assert isinstance(lookup.ids, np.memmap)
+    assert lookup.ids.tolist() == [2, 3, 5, 9]
+
+def test_id_to_row(lookup):
+    """Tests the id -> row resolution, for single ids and arrays of ids."""
+    assert [lookup.row(i) for i in [5, 2, 9, 3]] == [0, 1, 2, 3]
+    assert 4 not in lookup and 100 not in lookup
+    with pytest.raises(KeyError):
+        lookup.row(4)
+    assert lookup.rows([9, 4, 2, 100, -1]).tolist() == [2, -1, 1, -1, -1]
+
+def test_url_resolution(lookup):
+    """Tests the url -> id and url -> row resolution."""
+    assert lookup.url_to_id(f'{PREFIX}9/') == 9
+    assert lookup.url_to_row(f'{PREFIX}3/') == 3
+    with pytest.raises(KeyError):
+        lookup.url_to_id('https://swapi.dev/api/vehicles/9/')
+    with pytest.raises(KeyError):
+        lookup.url_to_id(f'{PREFIX}4/')
+
+def test_empty_category(tmp_path):
+    """Tests the lookup of a category without items."""
+    build_lookup(str(tmp_path), 'vehicles', [], 'https://swapi.dev/api/vehicles/')
+    lookup = IdLookup(str(tmp_path), 'vehicles')
+    assert len(lookup) == 0 and 1 not in lookup
+    assert lookup.rows([1, 2]).tolist() == [-1, -1]
+
+def test_links_from_the_store_columns(tmp_path):
+    """Tests that another process resolves the links from the mapped store columns only."""
+    from swapi_entities import CategoryStore
+    from swapi_lookup import build_lookups
+    items = [
+        {"name": "Luke Skywalker", "homeworld": "https://swapi.dev/api/planets/1/",
+         "films": ["https://swapi.dev/api/films/1/", "https://swapi.dev/api/films/2/"],
+         "url": "https://swapi.dev/api/people/1/"},
+        {"name": "Leia Organa", "homeworld": None, "films": [],
+         "url": "https://swapi.dev/api/people/5/"},
+    ]
+    store = CategoryStore.from_raw_items('people', items, ['homeworld', 'films'])
+    build_lookups(str(tmp_path), {'people': store})
+    del store
+
+    lookup = IdLookup(str(tmp_path), 'people')
+    assert isinstance(lookup.store_ids, np.memmap)
+    assert lookup.store_ids[lookup.row(5)] == 5
+    assert lookup.links('homeworld', 1) == 1
+    assert lookup.links('homeworld', 5) is None
+    assert lookup.links('films', 1).tolist() == [1, 2]
+    assert lookup.links('films', 5).tolist() == []
+
+def test_rebuild_switches_generations(tmp_path):
+    """Tests that a reader keeps one consistent generation while the lookups are rebuilt."""
+    from swapi_entities import CategoryStore
+    from swapi_lookup import build_lookups
+
+    def store(urls):
+        items = [{'name': str(i), 'url': url} for i, url in enumerate(urls)]
+        return CategoryStore.from_raw_items('starships', items, [])
+
+    build_lookups(str(tmp_path), {'starships': store([f'{PREFIX}5/', f'{PREFIX}2/'])})
+    before = IdLookup(str(tmp_path), 'starships')
+
+    for _ in range(3):
+        build_lookups(str(tmp_path), {'starships': store([f'{PREFIX}2/', f'{PREFIX}5/', f'{PREFIX}9/'])})
+    after = IdLookup(str(tmp_path), 'starships')
+
+    # the old reader still sees its own files, the new one the last build
+    assert before.row(5) == 0 and 9 not in before
+    assert after.row(5) == 1 and after.row(9) == 2
+    # the current generation and the previous one are kept
+    assert len([name for name in os.listdir(tmp_path) if name.startswith('gen-')]) == 2
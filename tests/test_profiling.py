@@ -0,0 +1,75 @@
+import pytest
+import pandas as pd
+from sqlalchemy import create_engine
+
+from swapi_profiling import LoadProfiler
+
+@pytest.fixture
+def engine():
+    """Creates an in-memory SQLite database for testing."""
+    engine = create_engine('sqlite:///:memory:')
+    yield engine
+    engine.dispose()
+
+def test_profiler_records_statements_per_table(engine):
+    """Tests that the inserts are attributed to the table being loaded."""
+    profiler = LoadProfiler().attach(engine)
+    df = pd.DataFrame({'planet_id': range(10), 'name': [f'planet {i}' for i in range(10)]})
+
+    with profiler.table('planets'):
+        df.to_sql(name='planets', con=engine, index=False, chunksize=4)
+    profiler.detach()
+
+    inserts = [s for s in profiler.statements if s[1] == 'INSERT']
+    assert [s[0] for s in inserts] == ['planets'] * 3
+    assert [s[2] for s in inserts] == [4, 4, 2]
+    assert profiler.checkouts and profiler.checkouts[0][0] == 'planets'
+
+    summary = profiler.summary().set_index('table')
+    assert summary.loc['planets', 'max_rows_per_statement'] == 4
+    assert summary.loc['planets', 'checkouts'] >= 1
+
+def test_detach_stops_recording(engine):
+    """Tests that nothing is recorded once the profiler is detached."""
+    profiler = LoadProfiler().attach(engine)
+    profiler.detach()
+    pd.DataFrame({'a': [1]}).to_sql(name='t', con=engine, index=False)
+    assert profiler.statements == [] and profiler.checkouts == []
+
+def test_checkouts_survive_dispose(engine):
+    """Tests that checkouts are still timed after the pool is replaced by dispose()."""
+    profiler = LoadProfiler().attach(engine)
+    engine.dispose()
+    with profiler.table('t'):
+        pd.DataFrame({'a': [1]}).to_sql(name='t', con=engine, index=False)
+    profiler.detach()
+    assert profiler.checkouts and profiler.checkouts[0][0] == 't'
+
+    checkouts = len(profiler.checkouts)
+    pd.DataFrame({'a': [2]}).to_sql(name='t', con=engine, index=False, if_exists='append')
+    assert len(profiler.checkouts) == checkouts
+
+def test_folded_stacks(engine):
+    """Tests the flamegraph folded stacks export."""
+    profiler = LoadProfiler().attach(engine)
+    with profiler.table('films'):
+        pd.DataFrame({'film_id': [1, 2]}).to_sql(name='films', con=engine, index=False)
+    profiler.detach()
+
+    stacks = dict(line.rsplit(' ', 1) for line in profiler.folded_stacks())
+    assert 'load;films;INSERT' in stacks
+    assert 'load;films;checkout' in stacks
+    assert all(int(v) >= 0 for v in stacks.values())
+
+def test_summary_counts_only_inserts(engine):
+    """Tests that the to_sql introspection statements are kept out of the chunk statistics."""
+    profiler = LoadProfiler().attach(engine)
+    with profiler.table('species'):
+        pd.DataFrame({'species_id': range(37)}).to_sql(name='species', con=engine, index=False)
+    profiler.detach()
+
+    summary = profiler.summary().set_index('table')
+    assert summary.loc['species', 'statements'] == 1
+    assert summary.loc['species', 'rows'] == 37
+    assert summary.loc['species', 'rows_per_statement'] == 37
+    assert summary.loc['species', 'other_statements'] >= 1